@@ -1,20 +1,206 @@
 from flask import Flask, jsonify, Response, request, render_template
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
+from werkzeug.exceptions import HTTPException
 import sqlite3
-import json
+import atexit
+import os
+import re
+import threading
+import time
+import zlib
+import orjson
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
 
+
+def json_default(obj):
+    """Сериализация типов, которые orjson не знает (строки sqlite3.Row)"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON-провайдер Flask на базе orjson"""
+
+    # Те же настройки, что и у стандартного провайдера Flask
+    sort_keys = True
+    compact = None
+
+    def _option(self):
+        option = 0
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=json_default, option=self._option()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=json_default, option=self._option()),
+            mimetype='application/json'
+        )
+
+
 app = Flask(__name__)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+# Без сортировки ключей и отступов, в том числе в режиме отладки
+app.json.sort_keys = False
+app.json.compact = True
+
+# Сжатие ответов: brotli для поддерживающих его клиентов, иначе gzip
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+Compress(app)
+
+DB_PATH = 'documents.db'
+SEED_TEMPLATES_PATH = os.path.join(app.root_path, 'data', 'seed_templates.json')
+SEED_DB_PATH = os.path.join(app.root_path, 'data', 'seed.db')
 
 def get_db_connection():
     """Подключение к базе данных SQLite"""
-    conn = sqlite3.connect('documents.db')
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    
+    # Настройки действуют только в рамках соединения
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA busy_timeout = 5000')
+    conn.execute('PRAGMA cache_size = -20000')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+# Соединения: по одному читателю на поток сервера и один писатель.
+# sqlite3 отпускает GIL на время запроса, поэтому чтения из разных потоков
+# сервера выполняются параллельно
+SERVER_THREADS = 8
+_local = threading.local()
+_write_conn = None
+_write_lock = threading.Lock()
+
+def get_db():
+    """Соединение для чтения, закрепленное за текущим потоком"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = get_db_connection()
     return conn
 
+@contextmanager
+def get_write_conn():
+    """Соединение для записи (коммит при успехе, откат при ошибке)"""
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = get_db_connection()
+        with _write_conn:
+            yield _write_conn
+
+@contextmanager
+def bulk_load(conn):
+    """Транзакция массовой загрузки без fsync"""
+    # Только для данных, которые можно загрузить повторно (сид):
+    # при сбое питания последняя транзакция может потеряться
+    conn.execute('PRAGMA synchronous = OFF')
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        with conn:
+            yield conn
+    finally:
+        conn.execute('PRAGMA synchronous = NORMAL')
+
+# Кэш готовых JSON-ответов для редко меняющихся данных
+CACHE_TTL = 60
+_response_cache = {}
+
+def get_cached_response(key):
+    """Ответ из кэша, если он еще не устарел"""
+    entry = _response_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return Response(entry[1], mimetype='application/json')
+    return None
+
+def cache_response(key, data):
+    """Сериализовать ответ и сохранить его в кэше"""
+    body = orjson.dumps(data, default=json_default)
+    _response_cache[key] = (time.monotonic() + CACHE_TTL, body)
+    return Response(body, mimetype='application/json')
+
+# Просмотры шаблонов копятся в памяти и записываются в базу пачкой
+POPULARITY_FLUSH_INTERVAL = 1.0
+_popularity_counter = Counter()
+# Просмотры, которые записываются прямо сейчас: видны в ответах до коммита
+_popularity_inflight = Counter()
+# Увеличивается при каждом коммите просмотров (под _popularity_lock)
+_popularity_generation = 0
+_popularity_lock = threading.Lock()
+_popularity_flush_lock = threading.Lock()
+_popularity_timer = None
+
+def schedule_popularity_flush():
+    """Запланировать запись просмотров (вызывается под _popularity_lock)"""
+    global _popularity_timer
+    if _popularity_timer is None:
+        _popularity_timer = threading.Timer(POPULARITY_FLUSH_INTERVAL, flush_popularity)
+        _popularity_timer.daemon = True
+        _popularity_timer.start()
+
+def flush_popularity():
+    """Записать накопленные просмотры одной транзакцией"""
+    global _popularity_timer, _popularity_counter, _popularity_inflight, _popularity_generation
+    with _popularity_flush_lock:
+        # Накопленные просмотры забираются целиком, новые копятся в новом счетчике
+        with _popularity_lock:
+            _popularity_timer = None
+            if not _popularity_counter:
+                return
+            _popularity_inflight = _popularity_counter
+            _popularity_counter = Counter()
+        
+        rows = [(count, template_id) for template_id, count in _popularity_inflight.items()]
+        try:
+            # Ожидание писателя и запись идут без _popularity_lock
+            with get_write_conn() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(_Q_BUMP_POPULARITY, rows)
+                # Коммит и сброс in-flight происходят атомарно для читателей,
+                # поэтому счетчик в ответах не уменьшается
+                with _popularity_lock:
+                    conn.commit()
+                    _popularity_inflight = Counter()
+                    _popularity_generation += 1
+        except Exception:
+            # Незаписанные просмотры возвращаются в счетчик до следующей попытки
+            with _popularity_lock:
+                _popularity_counter.update(_popularity_inflight)
+                _popularity_inflight = Counter()
+            raise
+
+atexit.register(flush_popularity)
+
+# Вторичные индексы шаблонов: общие для схемы и для пересоздания при сиде
+TEMPLATE_INDEXES = (
+    ('idx_templates_pop', 'CREATE INDEX IF NOT EXISTS idx_templates_pop ON templates (popularity DESC, name)'),
+    ('idx_templates_cat', 'CREATE INDEX IF NOT EXISTS idx_templates_cat ON templates (category_id)'),
+    ('idx_templates_type', 'CREATE INDEX IF NOT EXISTS idx_templates_type ON templates (doc_type)')
+)
+
 def init_database():
     """Инициализация базы данных с таблицами"""
     conn = get_db_connection()
     
+    # Режим WAL сохраняется в файле базы: читатели не блокируются записью
+    conn.execute('PRAGMA journal_mode = WAL')
+    
     # Таблица категорий документов
     conn.execute('''
         CREATE TABLE IF NOT EXISTS categories (
@@ -30,33 +216,97 @@ def init_database():
         CREATE TABLE IF NOT EXISTS templates (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             category_id INTEGER,
+            category_name TEXT,  -- копия categories.name для выборок без JOIN
             name TEXT NOT NULL,
             description TEXT,
             doc_type TEXT CHECK(doc_type IN ('Договор', 'Заявление', 'Исковое заявление', 'Соглашение', 'Расторжение', 'Акт', 'Доверенность', 'Приказ', 'Прочее')),
             word_count INTEGER,
             popularity INTEGER DEFAULT 0,
+            fields_json TEXT NOT NULL DEFAULT '[]',  -- JSON массив полей в формате API
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (category_id) REFERENCES categories (id)
         )
     ''')
     
-    # Таблица полей шаблонов
+    # Базы, созданные до появления category_name
+    columns = [column['name'] for column in conn.execute('PRAGMA table_info(templates)')]
+    if 'category_name' not in columns:
+        conn.execute('ALTER TABLE templates ADD COLUMN category_name TEXT')
+        conn.execute('UPDATE templates SET category_name = (SELECT name FROM categories WHERE id = category_id)')
+    
+    # Базы, в которых поля хранились отдельной таблицей template_fields:
+    # переносим их в fields_json (json_patch с '{}' отбрасывает пустые ключи)
+    if 'fields_json' not in columns:
+        conn.execute("ALTER TABLE templates ADD COLUMN fields_json TEXT NOT NULL DEFAULT '[]'")
+        fields_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'template_fields'"
+        ).fetchone()
+        if fields_table:
+            conn.execute('''
+                UPDATE templates SET fields_json = (
+                    SELECT COALESCE(json_group_array(json(field)), '[]') FROM (
+                        SELECT json_patch('{}', json_object(
+                            'key', field_key,
+                            'label', field_label,
+                            'type', field_type,
+                            'required', json(CASE WHEN is_required THEN 'true' ELSE 'false' END),
+                            'placeholder', COALESCE(placeholder, ''),
+                            'min', min_value,
+                            'max', max_value,
+                            'format', NULLIF(format, ''),
+                            'options', CASE WHEN json_valid(options) THEN json(options) END
+                        )) AS field
+                        FROM template_fields
+                        WHERE template_id = templates.id
+                        ORDER BY order_index, id
+                    )
+                )
+            ''')
+            conn.execute('DROP TABLE template_fields')
+    
+    # Переименование категории переносится в шаблоны
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS template_fields (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_id INTEGER NOT NULL,
-            field_key TEXT NOT NULL,
-            field_label TEXT NOT NULL,
-            field_type TEXT NOT NULL CHECK(field_type IN ('text', 'number', 'date', 'email', 'phone', 'select', 'textarea', 'boolean')),
-            is_required BOOLEAN DEFAULT 0,
-            min_value INTEGER,
-            max_value INTEGER,
-            format TEXT,
-            placeholder TEXT,
-            options TEXT,  -- JSON массив для select полей
-            order_index INTEGER DEFAULT 0,
-            FOREIGN KEY (template_id) REFERENCES templates (id)
-        )
+        CREATE TRIGGER IF NOT EXISTS trg_categories_rename
+        AFTER UPDATE OF name ON categories
+        BEGIN
+            UPDATE templates SET category_name = NEW.name WHERE category_id = NEW.id;
+        END
+    ''')
+    
+    # Полнотекстовый индекс по названию и описанию шаблонов
+    fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'templates_fts'"
+    ).fetchone()
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts
+        USING fts5(name, description, content='templates', content_rowid='id')
+    ''')
+    if not fts_exists:
+        conn.execute("INSERT INTO templates_fts (templates_fts) VALUES ('rebuild')")
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_templates_fts_insert
+        AFTER INSERT ON templates
+        BEGIN
+            INSERT INTO templates_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_templates_fts_delete
+        AFTER DELETE ON templates
+        BEGIN
+            INSERT INTO templates_fts (templates_fts, rowid, name, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_templates_fts_update
+        AFTER UPDATE OF name, description ON templates
+        BEGIN
+            INSERT INTO templates_fts (templates_fts, rowid, name, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description);
+            INSERT INTO templates_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+        END
     ''')
     
     # Таблица заполненных документов
@@ -72,671 +322,564 @@ def init_database():
         )
     ''')
     
+    # Индексы под фильтры и сортировки API
+    for _, create_sql in TEMPLATE_INDEXES:
+        conn.execute(create_sql)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_docs_created ON filled_documents (created_at DESC)')
+    
     conn.commit()
+    conn.execute('ANALYZE')
     conn.close()
 
+_db_initialized = False
+_init_lock = threading.Lock()
+
+@app.before_request
+def ensure_database():
+    """Создать схему один раз при первом запросе (в том числе под WSGI-сервером)"""
+    global _db_initialized
+    if not _db_initialized:
+        with _init_lock:
+            if not _db_initialized:
+                init_database()
+                _db_initialized = True
+
+# ==================== SQL ====================
+
+# Запросы хранятся строками-константами: одинаковый текст попадает
+# в кэш подготовленных выражений соединения
+
+_Q_CATEGORIES = '''
+    SELECT c.id, c.name, c.description, COUNT(t.id) as template_count
+    FROM categories c
+    LEFT JOIN templates t ON t.category_id = c.id
+    GROUP BY c.id
+    ORDER BY c.name
+'''
+
+_Q_TEMPLATES_BASE = '''
+    SELECT t.id, t.name, t.description, t.doc_type as type, t.category_name as category,
+           t.word_count, t.popularity
+    FROM templates t
+    WHERE 1=1
+'''
+
+def _build_templates_query(by_category, by_type, by_search):
+    """Собрать запрос списка шаблонов для заданного набора фильтров"""
+    query = _Q_TEMPLATES_BASE
+    if by_category:
+        query += ' AND t.category_id = ?'
+    if by_type:
+        query += ' AND t.doc_type = ?'
+    if by_search:
+        query += ' AND t.id IN (SELECT rowid FROM templates_fts WHERE templates_fts MATCH ?)'
+    return query + ' ORDER BY t.popularity DESC, t.name'
+
+# Все 8 сочетаний фильтров: (category_id, doc_type, search)
+_Q_TEMPLATES = {
+    (by_category, by_type, by_search): _build_templates_query(by_category, by_type, by_search)
+    for by_category in (False, True)
+    for by_type in (False, True)
+    for by_search in (False, True)
+}
+
+def build_fts_query(search):
+    """Превратить строку поиска в запрос FTS5: все слова как префиксы"""
+    words = re.findall(r'\w+', search)
+    return ' '.join(f'"{word}"*' for word in words)
+
+_Q_TEMPLATE_DETAIL = '''
+    SELECT id, name, description, doc_type, category_id, category_name,
+           word_count, popularity, created_at
+    FROM templates 
+    WHERE id = ?
+'''
+
+_Q_BUMP_POPULARITY = 'UPDATE templates SET popularity = popularity + ? WHERE id = ?'
+
+_Q_TEMPLATE_FIELDS = 'SELECT id, name, fields_json FROM templates WHERE id = ?'
+
+_Q_INSERT_DOCUMENT = '''
+    INSERT INTO filled_documents (template_id, document_data, status)
+    VALUES (?, ?, ?)
+'''
+
+_Q_DOC_LIST = '''
+    SELECT fd.id, fd.template_id, t.name as template_name,
+           fd.created_at, fd.status
+    FROM filled_documents fd
+    JOIN templates t ON fd.template_id = t.id
+    ORDER BY fd.created_at DESC
+    LIMIT 100
+'''
+
+_Q_COUNT_TEMPLATES = 'SELECT COUNT(*) as count FROM templates'
+
+_Q_COUNT_DOCUMENTS = 'SELECT COUNT(*) as count FROM filled_documents'
+
+_Q_POPULAR_TEMPLATES = '''
+    SELECT id, name, popularity 
+    FROM templates 
+    ORDER BY popularity DESC 
+    LIMIT 5
+'''
+
+_Q_RECENT_DOCUMENTS = '''
+    SELECT fd.id, t.name, fd.created_at 
+    FROM filled_documents fd
+    JOIN templates t ON fd.template_id = t.id
+    ORDER BY fd.created_at DESC 
+    LIMIT 5
+'''
+
+# Запросы сида: VALUES к вставкам добавляет multi_values_sql
+_Q_LAST_SEQ = 'SELECT seq FROM sqlite_sequence WHERE name = ?'
+
+_Q_INSERT_SEED_CATEGORIES = 'INSERT INTO categories (id, name, description)'
+
+_Q_INSERT_SEED_TEMPLATES = '''
+    INSERT INTO templates (id, category_id, category_name, name, description, doc_type, word_count, fields_json)
+'''
+
+_Q_COPY_SEED_CATEGORIES = '''
+    INSERT INTO categories (id, name, description)
+    SELECT id + ?, name, description FROM seed.categories ORDER BY id
+'''
+
+_Q_COPY_SEED_TEMPLATES = '''
+    INSERT INTO templates (id, category_id, category_name, name, description, doc_type, word_count, fields_json)
+    SELECT id + ?, category_id + ?, category_name, name, description, doc_type, word_count, fields_json
+    FROM seed.templates ORDER BY id
+'''
+
+# ==================== ERRORS ====================
+
+# Тела частых ошибок сериализуются один раз при импорте
+_ERR_TEMPLATE_NOT_FOUND = (orjson.dumps({'error': 'Шаблон не найден'}), 404)
+_ERR_BAD_DOCUMENT_REQUEST = (orjson.dumps({'error': 'Необходимы template_id и fields'}), 400)
+
+def error_response(error):
+    """Ответ из заранее подготовленной ошибки"""
+    body, status = error
+    return Response(body, status=status, mimetype='application/json')
+
+@app.errorhandler(Exception)
+def handle_exception(e):
+    """Необработанные исключения API возвращаются как JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    app.logger.exception('Ошибка при обработке %s', request.path)
+    return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+
 # ==================== FRONTEND ROUTES ====================
 
+# Страницы не зависят от данных в базе, поэтому рендерятся один раз
+@lru_cache(maxsize=None)
+def render_page(name):
+    """Отрендерить статическую страницу"""
+    return render_template(name)
+
 @app.route('/')
 def index():
     """Главная страница"""
-    return render_template('index.html')
+    return render_page('index.html')
 
 @app.route('/templates')
 def templates_page():
     """Страница с шаблонами"""
-    return render_template('templates.html')
+    return render_page('templates.html')
 
 @app.route('/document/<int:template_id>')
 def document_page(template_id):
     """Страница заполнения документа"""
-    return render_template('document.html', template_id=template_id)
+    return render_page('document.html')
 
 # ==================== API ROUTES ====================
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Получить все категории документов"""
-    try:
-        conn = get_db_connection()
-        categories = conn.execute('''
-            SELECT id, name, description, 
-                   (SELECT COUNT(*) FROM templates WHERE category_id = categories.id) as template_count
-            FROM categories 
-            ORDER BY name
-        ''').fetchall()
-        conn.close()
-        
-        categories_list = []
-        for cat in categories:
-            categories_list.append({
-                'id': cat['id'],
-                'name': cat['name'],
-                'description': cat['description'],
-                'template_count': cat['template_count']
-            })
-        
-        return jsonify({
-            'success': True,
-            'categories': categories_list,
-            'count': len(categories_list)
-        })
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+    cached = get_cached_response('categories')
+    if cached:
+        return cached
+    
+    conn = get_db()
+    categories = conn.execute(_Q_CATEGORIES).fetchall()
+    
+    # Строки sqlite3.Row сериализуются напрямую, без промежуточных словарей
+    return cache_response('categories', {
+        'success': True,
+        'categories': categories,
+        'count': len(categories)
+    })
 
 @app.route('/api/templates', methods=['GET'])
 def get_all_templates():
     """Получить все шаблоны с фильтрацией"""
-    try:
-        category_id = request.args.get('category_id', type=int)
-        doc_type = request.args.get('doc_type')
-        search = request.args.get('search', '')
-        
-        conn = get_db_connection()
-        
-        query = '''
-            SELECT t.id, t.name, t.description, t.doc_type, t.word_count, t.popularity,
-                   c.name as category_name
-            FROM templates t
-            LEFT JOIN categories c ON t.category_id = c.id
-            WHERE 1=1
-        '''
-        params = []
-        
-        if category_id:
-            query += ' AND t.category_id = ?'
-            params.append(category_id)
-        
-        if doc_type:
-            query += ' AND t.doc_type = ?'
-            params.append(doc_type)
-        
-        if search:
-            query += ' AND (t.name LIKE ? OR t.description LIKE ?)'
-            params.extend([f'%{search}%', f'%{search}%'])
-        
-        query += ' ORDER BY t.popularity DESC, t.name'
-        
-        templates = conn.execute(query, params).fetchall()
-        conn.close()
-        
-        templates_list = []
-        for template in templates:
-            templates_list.append({
-                'id': template['id'],
-                'name': template['name'],
-                'description': template['description'],
-                'type': template['doc_type'],
-                'category': template['category_name'],
-                'word_count': template['word_count'],
-                'popularity': template['popularity']
-            })
-        
-        return jsonify({
-            'success': True,
-            'templates': templates_list,
-            'count': len(templates_list)
-        })
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+    category_id = request.args.get('category_id', type=int)
+    doc_type = request.args.get('doc_type')
+    search = build_fts_query(request.args.get('search', ''))
+    
+    query = _Q_TEMPLATES[bool(category_id), bool(doc_type), bool(search)]
+    params = []
+    
+    if category_id:
+        params.append(category_id)
+    
+    if doc_type:
+        params.append(doc_type)
+    
+    if search:
+        params.append(search)
+    
+    conn = get_db()
+    templates = conn.execute(query, params).fetchall()
+    
+    return jsonify({
+        'success': True,
+        'templates': templates,
+        'count': len(templates)
+    })
 
 @app.route('/api/templates/<int:template_id>', methods=['GET'])
 def get_template_detail(template_id):
     """Получить детальную информацию о шаблоне"""
-    try:
-        conn = get_db_connection()
-        
-        template = conn.execute('''
-            SELECT t.*, c.name as category_name 
-            FROM templates t 
-            LEFT JOIN categories c ON t.category_id = c.id 
-            WHERE t.id = ?
-        ''', (template_id,)).fetchone()
+    conn = get_db()
+    
+    while True:
+        generation = _popularity_generation
+        template = conn.execute(_Q_TEMPLATE_DETAIL, (template_id,)).fetchone()
         
         if not template:
-            return jsonify({'error': 'Шаблон не найден'}), 404
-        
-        # Увеличиваем счетчик популярности
-        conn.execute('UPDATE templates SET popularity = popularity + 1 WHERE id = ?', (template_id,))
-        conn.commit()
-        
-        template_data = {
-            'id': template['id'],
-            'name': template['name'],
-            'description': template['description'],
-            'type': template['doc_type'],
-            'category': template['category_name'],
-            'category_id': template['category_id'],
-            'word_count': template['word_count'],
-            'popularity': template['popularity'],
-            'created_at': template['created_at']
-        }
-        
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'template': template_data
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+            return error_response(_ERR_TEMPLATE_NOT_FOUND)
+        
+        # Увеличиваем счетчик популярности в памяти, в базу он попадет пачкой.
+        # Если между чтением и блокировкой закоммитились просмотры, строка могла
+        # устареть относительно in-flight: перечитываем ее
+        with _popularity_lock:
+            if generation == _popularity_generation:
+                _popularity_counter[template_id] += 1
+                popularity = (template['popularity'] + _popularity_inflight[template_id]
+                              + _popularity_counter[template_id])
+                schedule_popularity_flush()
+                break
+    
+    template_data = {
+        'id': template['id'],
+        'name': template['name'],
+        'description': template['description'],
+        'type': template['doc_type'],
+        'category': template['category_name'],
+        'category_id': template['category_id'],
+        'word_count': template['word_count'],
+        'popularity': popularity,
+        'created_at': template['created_at']
+    }
+    
+    return jsonify({
+        'success': True,
+        'template': template_data
+    })
 
 @app.route('/api/templates/<int:template_id>/fields', methods=['GET'])
 def get_template_fields(template_id):
     """Получить поля шаблона"""
-    try:
-        conn = get_db_connection()
-        
-        template = conn.execute(
-            'SELECT id, name FROM templates WHERE id = ?', 
-            (template_id,)
-        ).fetchone()
-        
-        if not template:
-            return jsonify({'error': 'Шаблон не найден'}), 404
-        
-        fields = conn.execute('''
-            SELECT 
-                field_key, 
-                field_label, 
-                field_type, 
-                is_required,
-                min_value,
-                max_value,
-                format,
-                placeholder,
-                options,
-                order_index
-            FROM template_fields 
-            WHERE template_id = ? 
-            ORDER BY order_index, id
-        ''', (template_id,)).fetchall()
-        conn.close()
-        
-        response = {
-            'success': True,
-            'template_id': template_id,
-            'template_name': template['name'],
-            'fields': []
-        }
-        
-        for field in fields:
-            field_data = {
-                'key': field['field_key'],
-                'label': field['field_label'],
-                'type': field['field_type'],
-                'required': bool(field['is_required']),
-                'placeholder': field['placeholder'] or ''
-            }
-            
-            if field['min_value'] is not None:
-                field_data['min'] = field['min_value']
-            
-            if field['max_value'] is not None:
-                field_data['max'] = field['max_value']
-            
-            if field['format'] and field['format'] != '':
-                field_data['format'] = field['format']
-            
-            if field['options']:
-                try:
-                    field_data['options'] = json.loads(field['options'])
-                except:
-                    field_data['options'] = []
-            
-            response['fields'].append(field_data)
-        
-        return Response(
-            json.dumps(response, ensure_ascii=False, indent=2),
-            mimetype='application/json; charset=utf-8'
-        )
-        
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+    cached = get_cached_response(('fields', template_id))
+    if cached:
+        return cached
+    
+    conn = get_db()
+    template = conn.execute(_Q_TEMPLATE_FIELDS, (template_id,)).fetchone()
+    
+    if not template:
+        return error_response(_ERR_TEMPLATE_NOT_FOUND)
+    
+    # Поля уже хранятся в формате API: один разбор JSON вместо выборки строк
+    return cache_response(('fields', template_id), {
+        'success': True,
+        'template_id': template_id,
+        'template_name': template['name'],
+        'fields': orjson.loads(template['fields_json'])
+    })
 
 @app.route('/api/documents/generate', methods=['POST'])
 def generate_document():
     """Сгенерировать документ на основе шаблона и данных"""
     try:
-        data = request.get_json()
-        
-        if not data or 'template_id' not in data or 'fields' not in data:
-            return jsonify({'error': 'Необходимы template_id и fields'}), 400
-        
-        template_id = data['template_id']
-        fields_data = data['fields']
-        
-        conn = get_db_connection()
-        
-        template = conn.execute(
-            'SELECT id, name FROM templates WHERE id = ?', 
-            (template_id,)
-        ).fetchone()
+        data = orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        data = None
+    
+    if not isinstance(data, dict) or 'template_id' not in data or not isinstance(data.get('fields'), dict):
+        return error_response(_ERR_BAD_DOCUMENT_REQUEST)
+    
+    template_id = data['template_id']
+    fields_data = data['fields']
+    
+    with get_write_conn() as conn:
+        template = conn.execute(_Q_TEMPLATE_FIELDS, (template_id,)).fetchone()
         
         if not template:
-            return jsonify({'error': 'Шаблон не найден'}), 404
+            return error_response(_ERR_TEMPLATE_NOT_FOUND)
         
-        # Валидация полей
-        template_fields = conn.execute(
-            'SELECT field_key, field_type, is_required FROM template_fields WHERE template_id = ?',
-            (template_id,)
-        ).fetchall()
+        # Валидация полей: обязательные минус заполненные
+        required_fields = [field['key'] for field in orjson.loads(template['fields_json']) if field['required']]
+        filled_fields = {key for key, value in fields_data.items() if value}
+        missing_fields = set(required_fields) - filled_fields
         
-        required_fields = [field['field_key'] for field in template_fields if field['is_required']]
-        for req_field in required_fields:
-            if req_field not in fields_data or not fields_data[req_field]:
-                return jsonify({'error': f'Обязательное поле "{req_field}" не заполнено'}), 400
+        if missing_fields:
+            names = ', '.join(f'"{key}"' for key in required_fields if key in missing_fields)
+            return jsonify({'error': f'Обязательные поля не заполнены: {names}'}), 400
         
         # Сохраняем документ
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO filled_documents (template_id, document_data, status)
-            VALUES (?, ?, ?)
-        ''', (template_id, json.dumps(fields_data), 'generated'))
+        cursor = conn.execute(_Q_INSERT_DOCUMENT, (template_id, orjson.dumps(fields_data).decode('utf-8'), 'generated'))
         
         document_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'document_id': document_id,
-            'message': 'Документ успешно создан',
-            'template_name': template['name'],
-            'generated_at': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Ошибка при создании документа: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'document_id': document_id,
+        'message': 'Документ успешно создан',
+        'template_name': template['name'],
+        'generated_at': datetime.now().isoformat()
+    })
 
 @app.route('/api/documents', methods=['GET'])
 def get_documents():
     """Получить список созданных документов"""
-    try:
-        conn = get_db_connection()
-        
-        documents = conn.execute('''
-            SELECT fd.id, fd.template_id, fd.created_at, fd.status,
-                   t.name as template_name
-            FROM filled_documents fd
-            JOIN templates t ON fd.template_id = t.id
-            ORDER BY fd.created_at DESC
-            LIMIT 100
-        ''').fetchall()
-        
-        conn.close()
-        
-        documents_list = []
-        for doc in documents:
-            documents_list.append({
-                'id': doc['id'],
-                'template_id': doc['template_id'],
-                'template_name': doc['template_name'],
-                'created_at': doc['created_at'],
-                'status': doc['status']
-            })
-        
-        return jsonify({
-            'success': True,
-            'documents': documents_list,
-            'count': len(documents_list)
-        })
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+    conn = get_db()
+    documents = conn.execute(_Q_DOC_LIST).fetchall()
+    
+    return jsonify({
+        'success': True,
+        'documents': documents,
+        'count': len(documents)
+    })
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """Получить статистику по использованию"""
-    try:
-        conn = get_db_connection()
-        
-        total_templates = conn.execute('SELECT COUNT(*) as count FROM templates').fetchone()['count']
-        total_documents = conn.execute('SELECT COUNT(*) as count FROM filled_documents').fetchone()['count']
-        
-        popular_templates = conn.execute('''
-            SELECT id, name, popularity 
-            FROM templates 
-            ORDER BY popularity DESC 
-            LIMIT 5
-        ''').fetchall()
-        
-        recent_documents = conn.execute('''
-            SELECT fd.id, t.name, fd.created_at 
-            FROM filled_documents fd
-            JOIN templates t ON fd.template_id = t.id
-            ORDER BY fd.created_at DESC 
-            LIMIT 5
-        ''').fetchall()
-        
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'statistics': {
-                'total_templates': total_templates,
-                'total_documents': total_documents,
-                'popular_templates': [
-                    {'id': t['id'], 'name': t['name'], 'popularity': t['popularity']}
-                    for t in popular_templates
-                ],
-                'recent_documents': [
-                    {'id': d['id'], 'name': d['name'], 'created_at': d['created_at']}
-                    for d in recent_documents
-                ]
-            }
-        })
-    except Exception as e:
-        return jsonify({'error': f'Ошибка сервера: {str(e)}'}), 500
+    conn = get_db()
+    total_templates = conn.execute(_Q_COUNT_TEMPLATES).fetchone()['count']
+    total_documents = conn.execute(_Q_COUNT_DOCUMENTS).fetchone()['count']
+    popular_templates = conn.execute(_Q_POPULAR_TEMPLATES).fetchall()
+    recent_documents = conn.execute(_Q_RECENT_DOCUMENTS).fetchall()
+    
+    return jsonify({
+        'success': True,
+        'statistics': {
+            'total_templates': total_templates,
+            'total_documents': total_documents,
+            'popular_templates': popular_templates,
+            'recent_documents': recent_documents
+        }
+    })
+
+# ==================== SEED DATA ====================
+
+# Начальные данные загружаются один раз при импорте
+SEED_CATEGORIES = (
+    ('Договоры', 'Юридические договоры различных типов'),
+    ('Заявления', 'Официальные заявления'),
+    ('Исковые заявления', 'Документы для подачи в суд'),
+    ('Соглашения и расторжения', 'Дополнительные соглашения и расторжения договоров'),
+    ('Акты', 'Акты приема-передачи и другие акты'),
+    ('Доверенности', 'Доверенности различного назначения'),
+    ('Приказы', 'Организационно-распорядительные документы'),
+    ('Прочее', 'Прочие документы')
+)
+
+# 10 ключевых шаблонов хранятся в data/seed_templates.json
+with open(SEED_TEMPLATES_PATH, 'rb') as f:
+    SEED_TEMPLATES = tuple(orjson.loads(f.read()))
+
+# Допустимые типы полей (раньше их проверял CHECK таблицы template_fields)
+FIELD_TYPES = frozenset(('text', 'number', 'date', 'email', 'phone', 'select', 'textarea', 'boolean'))
+
+# Допустимые типы документов (как в CHECK таблицы templates)
+DOC_TYPES = frozenset(('Договор', 'Заявление', 'Исковое заявление', 'Соглашение', 'Расторжение',
+                       'Акт', 'Доверенность', 'Приказ', 'Прочее'))
+
+def _validate_seed():
+    """Проверить начальные данные при импорте: ошибка в них останавливает запуск"""
+    category_names = {name for name, _ in SEED_CATEGORIES}
+    template_names = set()
+    for template in SEED_TEMPLATES:
+        name = template.get('name')
+        missing = {'name', 'category', 'type', 'word_count', 'fields'} - template.keys()
+        if missing:
+            raise ValueError(f"Шаблон '{name}': нет ключей {', '.join(sorted(missing))}")
+        if name in template_names:
+            raise ValueError(f"Шаблон '{name}' указан дважды")
+        template_names.add(name)
+        if template['category'] not in category_names:
+            raise ValueError(f"Шаблон '{name}': неизвестная категория '{template['category']}'")
+        if template['type'] not in DOC_TYPES:
+            raise ValueError(f"Шаблон '{name}': неизвестный тип документа '{template['type']}'")
+        
+        for field in template['fields']:
+            missing = {'key', 'label', 'type'} - field.keys()
+            if missing:
+                raise ValueError(f"Шаблон '{name}': у поля нет ключей {', '.join(sorted(missing))}")
+            if field['type'] not in FIELD_TYPES:
+                raise ValueError(f"Шаблон '{name}': неизвестный тип поля '{field['key']}': {field['type']}")
+
+_validate_seed()
+
+def build_fields_json(fields):
+    """Привести поля шаблона из сида к формату API и сериализовать"""
+    api_fields = []
+    for field in fields:
+        field_data = {
+            'key': field['key'],
+            'label': field['label'],
+            'type': field['type'],
+            'required': bool(field.get('required', False)),
+            'placeholder': field.get('placeholder') or ''
+        }
+        for key in ('min', 'max', 'format', 'options'):
+            if field.get(key) is not None:
+                field_data[key] = field[key]
+        api_fields.append(field_data)
+    return orjson.dumps(api_fields).decode('utf-8')
+
+# Готовые к вставке строки с id, нумерованными с 1: при сиде они сдвигаются
+# на текущие счетчики таблиц. Поля сериализуются один раз при импорте
+CATEGORY_ID_BY_NAME = {name: i for i, (name, _) in enumerate(SEED_CATEGORIES, 1)}
+SEED_CATEGORY_ROWS = tuple((CATEGORY_ID_BY_NAME[name], name, description) for name, description in SEED_CATEGORIES)
+SEED_TEMPLATE_ROWS = tuple(
+    (i, CATEGORY_ID_BY_NAME[template['category']], template['category'], template['name'],
+     template.get('description', ''), template['type'], template['word_count'],
+     build_fields_json(template['fields']))
+    for i, template in enumerate(SEED_TEMPLATES, 1)
+)
+SEED_TEMPLATE_NAMES = tuple(row[3] for row in SEED_TEMPLATE_ROWS)
+
+# Ответ сида не зависит от запроса и сериализуется один раз
+_SEED_OK_BODY = orjson.dumps({
+    'success': True,
+    'message': f'База данных успешно заполнена! Добавлено {len(SEED_TEMPLATE_NAMES)} шаблонов.',
+    'templates_added': len(SEED_TEMPLATE_NAMES),
+    'templates_list': SEED_TEMPLATE_NAMES
+})
+
+# Версия начальных данных: data/seed.db используется, только если собран из них же
+SEED_VERSION = zlib.crc32(orjson.dumps([SEED_CATEGORY_ROWS, SEED_TEMPLATE_ROWS])) & 0x7fffffff
+
+def id_offset(conn, table):
+    """Сдвиг для id начальных данных: последний выданный id таблицы"""
+    # Счетчик из sqlite_sequence не уменьшается при удалении строк, поэтому
+    # id старых шаблонов, на которые ссылаются документы, не переиспользуются
+    row = conn.execute(_Q_LAST_SEQ, (table,)).fetchone()
+    return row['seq'] if row else 0
+
+# Ограничение SQLite на число параметров в одном запросе (для старых сборок)
+SQLITE_MAX_VARIABLES = 999
+
+@lru_cache(maxsize=None)
+def multi_values_sql(insert_sql, width, count):
+    """Текст INSERT с count наборами VALUES по width параметров"""
+    values = '(' + ', '.join('?' * width) + ')'
+    return insert_sql + ' VALUES ' + ', '.join([values] * count)
+
+def insert_many(conn, insert_sql, rows):
+    """Вставить строки многострочными INSERT в пределах лимита параметров"""
+    if not rows:
+        return
+    width = len(rows[0])
+    per_statement = SQLITE_MAX_VARIABLES // width
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        conn.execute(multi_values_sql(insert_sql, width, len(chunk)), [value for row in chunk for value in row])
+
+def insert_seed_data(conn):
+    """Вставить начальные данные в пустые таблицы"""
+    # id назначаются заранее, без чтения вставленных строк обратно
+    category_offset = id_offset(conn, 'categories')
+    template_offset = id_offset(conn, 'templates')
+    
+    # В новой базе строки вставляются как есть, иначе id сдвигаются
+    category_rows = SEED_CATEGORY_ROWS
+    template_rows = SEED_TEMPLATE_ROWS
+    if category_offset:
+        category_rows = [(category_offset + row[0],) + row[1:] for row in category_rows]
+    if category_offset or template_offset:
+        template_rows = [(template_offset + row[0], category_offset + row[1]) + row[2:] for row in template_rows]
+    
+    # Добавляем категории, затем шаблоны вместе с полями многострочными INSERT
+    insert_many(conn, _Q_INSERT_SEED_CATEGORIES, category_rows)
+    insert_many(conn, _Q_INSERT_SEED_TEMPLATES, template_rows)
+
+def attach_seed_db(conn, messages):
+    """Подключить собранную заранее базу data/seed.db, если она актуальна"""
+    if not os.path.exists(SEED_DB_PATH):
+        return False
+    
+    conn.execute('ATTACH DATABASE ? AS seed', (SEED_DB_PATH,))
+    if conn.execute('PRAGMA seed.user_version').fetchone()[0] != SEED_VERSION:
+        messages.append('data/seed.db устарела, начальные данные вставляются из сида')
+        conn.execute('DETACH DATABASE seed')
+        return False
+    return True
+
+def copy_seed_db(conn):
+    """Скопировать начальные данные из подключенной базы seed"""
+    # Нумерация в seed.db начинается с 1, id сдвигаются на текущие счетчики
+    category_offset = id_offset(conn, 'categories')
+    template_offset = id_offset(conn, 'templates')
+    
+    conn.execute(_Q_COPY_SEED_CATEGORIES, (category_offset,))
+    conn.execute(_Q_COPY_SEED_TEMPLATES, (template_offset, category_offset))
 
 @app.route('/api/admin/seed', methods=['POST'])
 def seed_database():
     """Заполнить базу данных начальными данными"""
-    try:
-        conn = get_db_connection()
-        
-        # Очищаем таблицы
-        conn.execute('DELETE FROM template_fields')
-        conn.execute('DELETE FROM templates')
-        conn.execute('DELETE FROM categories')
-        
-        # Добавляем категории
-        categories = [
-            ('Договоры', 'Юридические договоры различных типов'),
-            ('Заявления', 'Официальные заявления'),
-            ('Исковые заявления', 'Документы для подачи в суд'),
-            ('Соглашения и расторжения', 'Дополнительные соглашения и расторжения договоров'),
-            ('Акты', 'Акты приема-передачи и другие акты'),
-            ('Доверенности', 'Доверенности различного назначения'),
-            ('Приказы', 'Организационно-распорядительные документы'),
-            ('Прочее', 'Прочие документы')
-        ]
-        
-        category_ids = {}
-        for name, desc in categories:
-            cursor = conn.execute('INSERT INTO categories (name, description) VALUES (?, ?)', (name, desc))
-            category_ids[name] = cursor.lastrowid
-        
-        # 10 КЛЮЧЕВЫХ ШАБЛОНОВ
-        templates_data = [
-            # 1. Самый популярный - Договор аренды квартиры
-            {
-                'name': 'Образец договора аренды квартиры с мебелью и бытовой техникой',
-                'category': 'Договоры',
-                'type': 'Договор',
-                'word_count': 149900,
-                'description': 'Полный договор аренды квартиры с мебелью и техникой для длительной аренды',
-                'fields': [
-                    {'key': 'landlord_name', 'label': 'ФИО Арендодателя', 'type': 'text', 'required': True, 'placeholder': 'Иванов Иван Иванович'},
-                    {'key': 'landlord_passport', 'label': 'Паспортные данные Арендодателя', 'type': 'text', 'required': True, 'placeholder': 'Серия 1234 №567890 выдан ОВД района'},
-                    {'key': 'tenant_name', 'label': 'ФИО Арендатора', 'type': 'text', 'required': True, 'placeholder': 'Петров Петр Петрович'},
-                    {'key': 'tenant_passport', 'label': 'Паспортные данные Арендатора', 'type': 'text', 'required': True, 'placeholder': 'Серия 4321 №098765 выдан ОВД района'},
-                    {'key': 'address', 'label': 'Адрес квартиры', 'type': 'text', 'required': True, 'placeholder': 'г. Москва, ул. Ленина, д. 1, кв. 1'},
-                    {'key': 'apartment_area', 'label': 'Площадь квартиры (кв.м.)', 'type': 'number', 'required': True, 'min': 10, 'max': 500},
-                    {'key': 'rooms_count', 'label': 'Количество комнат', 'type': 'number', 'required': True, 'min': 1, 'max': 10},
-                    {'key': 'rent_amount', 'label': 'Сумма аренды (руб./мес.)', 'type': 'number', 'required': True, 'min': 1000, 'max': 1000000},
-                    {'key': 'start_date', 'label': 'Дата начала аренды', 'type': 'date', 'required': True},
-                    {'key': 'end_date', 'label': 'Дата окончания аренды', 'type': 'date', 'required': True},
-                    {'key': 'deposit', 'label': 'Залог (руб.)', 'type': 'number', 'required': False, 'min': 0},
-                    {'key': 'utilities_included', 'label': 'Коммунальные услуги включены', 'type': 'boolean', 'required': False}
-                ]
-            },
-            
-            # 2. Договор купли-продажи авто - очень популярен
-            {
-                'name': 'Договор купли-продажи транспортного средства',
-                'category': 'Договоры',
-                'type': 'Договор',
-                'word_count': 20017,
-                'description': 'Договор купли-продажи автомобиля между физическими лицами',
-                'fields': [
-                    {'key': 'seller_name', 'label': 'ФИО Продавца', 'type': 'text', 'required': True, 'placeholder': 'Сидоров Алексей Владимирович'},
-                    {'key': 'seller_passport', 'label': 'Паспортные данные Продавца', 'type': 'text', 'required': True, 'placeholder': 'Серия 1111 №222222'},
-                    {'key': 'buyer_name', 'label': 'ФИО Покупателя', 'type': 'text', 'required': True, 'placeholder': 'Кузнецов Дмитрий Сергеевич'},
-                    {'key': 'buyer_passport', 'label': 'Паспортные данные Покупателя', 'type': 'text', 'required': True, 'placeholder': 'Серия 3333 №444444'},
-                    {'key': 'car_brand', 'label': 'Марка автомобиля', 'type': 'text', 'required': True, 'placeholder': 'Toyota'},
-                    {'key': 'car_model', 'label': 'Модель автомобиля', 'type': 'text', 'required': True, 'placeholder': 'Camry'},
-                    {'key': 'car_year', 'label': 'Год выпуска', 'type': 'number', 'required': True, 'min': 1980, 'max': 2024},
-                    {'key': 'vin', 'label': 'VIN номер', 'type': 'text', 'required': True, 'placeholder': 'JTDBR32E160123456'},
-                    {'key': 'state_number', 'label': 'Государственный номер', 'type': 'text', 'required': True, 'placeholder': 'А123БВ77'},
-                    {'key': 'price', 'label': 'Цена (руб.)', 'type': 'number', 'required': True, 'min': 1000, 'max': 10000000},
-                    {'key': 'sale_date', 'label': 'Дата продажи', 'type': 'date', 'required': True},
-                    {'key': 'payment_method', 'label': 'Способ оплаты', 'type': 'select', 'required': True, 
-                     'options': ['Наличные', 'Банковский перевод', 'Другое']}
-                ]
-            },
-            
-            # 3. Трудовой договор - базовый документ
-            {
-                'name': 'Образец трудового договора',
-                'category': 'Договоры',
-                'type': 'Договор',
-                'word_count': 79545,
-                'description': 'Стандартный трудовой договор между работодателем и работником',
-                'fields': [
-                    {'key': 'employer_name', 'label': 'Наименование работодателя', 'type': 'text', 'required': True, 'placeholder': 'ООО "Ромашка"'},
-                    {'key': 'employer_details', 'label': 'Реквизиты работодателя', 'type': 'textarea', 'required': True, 'placeholder': 'ИНН 1234567890, ОГРН 1234567890123'},
-                    {'key': 'employee_name', 'label': 'ФИО работника', 'type': 'text', 'required': True, 'placeholder': 'Смирнова Анна Петровна'},
-                    {'key': 'employee_passport', 'label': 'Паспортные данные работника', 'type': 'text', 'required': True},
-                    {'key': 'position', 'label': 'Должность', 'type': 'text', 'required': True, 'placeholder': 'Менеджер по продажам'},
-                    {'key': 'department', 'label': 'Отдел/подразделение', 'type': 'text', 'required': True, 'placeholder': 'Отдел продаж'},
-                    {'key': 'salary', 'label': 'Оклад (руб.)', 'type': 'number', 'required': True, 'min': 16242, 'max': 1000000},
-                    {'key': 'start_date', 'label': 'Дата начала работы', 'type': 'date', 'required': True},
-                    {'key': 'contract_type', 'label': 'Вид договора', 'type': 'select', 'required': True,
-                     'options': ['Бессрочный', 'Срочный (до 5 лет)', 'Сезонный', 'На время выполнения работы']},
-                    {'key': 'probation_period', 'label': 'Испытательный срок (месяцев)', 'type': 'number', 'required': False, 'min': 0, 'max': 6},
-                    {'key': 'work_schedule', 'label': 'График работы', 'type': 'select', 'required': True,
-                     'options': ['5/2', '6/1', 'Сменный', 'Гибкий']}
-                ]
-            },
-            
-            # 4. Заявление на отпуск - самое популярное заявление
-            {
-                'name': 'Образец заявления на оплачиваемый отпуск',
-                'category': 'Заявления',
-                'type': 'Заявление',
-                'word_count': 15284,
-                'description': 'Заявление на ежегодный оплачиваемый отпуск',
-                'fields': [
-                    {'key': 'to_director', 'label': 'Кому (должность, ФИО)', 'type': 'text', 'required': True, 'placeholder': 'Генеральному директору ООО "Ромашка" Иванову И.И.'},
-                    {'key': 'employee_name', 'label': 'От кого (ФИО сотрудника)', 'type': 'text', 'required': True, 'placeholder': 'Петрова Мария Сергеевна'},
-                    {'key': 'position', 'label': 'Должность', 'type': 'text', 'required': True, 'placeholder': 'Менеджер'},
-                    {'key': 'department', 'label': 'Отдел', 'type': 'text', 'required': True, 'placeholder': 'Отдел маркетинга'},
-                    {'key': 'vacation_start', 'label': 'Дата начала отпуска', 'type': 'date', 'required': True},
-                    {'key': 'vacation_end', 'label': 'Дата окончания отпуска', 'type': 'date', 'required': True},
-                    {'key': 'vacation_days', 'label': 'Количество календарных дней', 'type': 'number', 'required': True, 'min': 1, 'max': 60},
-                    {'key': 'vacation_type', 'label': 'Тип отпуска', 'type': 'select', 'required': True,
-                     'options': ['Ежегодный оплачиваемый', 'Без сохранения зарплаты', 'Учебный', 'По беременности и родам']},
-                    {'key': 'application_date', 'label': 'Дата заявления', 'type': 'date', 'required': True},
-                    {'key': 'phone', 'label': 'Контактный телефон', 'type': 'phone', 'required': False, 'placeholder': '+7 (999) 123-45-67'}
-                ]
-            },
-            
-            # 5. Договор подряда - популярен для разовых работ
-            {
-                'name': 'Образец договора подряда, заключаемого между юридическим и физическим лицом',
-                'category': 'Договоры',
-                'type': 'Договор',
-                'word_count': 217729,
-                'description': 'Договор подряда на выполнение работ между компанией и физическим лицом',
-                'fields': [
-                    {'key': 'customer_name', 'label': 'Наименование Заказчика (компания)', 'type': 'text', 'required': True, 'placeholder': 'ООО "СтройГарант"'},
-                    {'key': 'customer_details', 'label': 'Реквизиты Заказчика', 'type': 'textarea', 'required': True},
-                    {'key': 'contractor_name', 'label': 'ФИО Подрядчика', 'type': 'text', 'required': True},
-                    {'key': 'contractor_passport', 'label': 'Паспортные данные Подрядчика', 'type': 'text', 'required': True},
-                    {'key': 'work_description', 'label': 'Описание работ', 'type': 'textarea', 'required': True, 'placeholder': 'Ремонт офисного помещения'},
-                    {'key': 'work_address', 'label': 'Адрес выполнения работ', 'type': 'text', 'required': True},
-                    {'key': 'start_date', 'label': 'Дата начала работ', 'type': 'date', 'required': True},
-                    {'key': 'end_date', 'label': 'Дата окончания работ', 'type': 'date', 'required': True},
-                    {'key': 'contract_price', 'label': 'Цена договора (руб.)', 'type': 'number', 'required': True, 'min': 1000},
-                    {'key': 'advance_payment', 'label': 'Аванс (руб.)', 'type': 'number', 'required': False, 'min': 0},
-                    {'key': 'payment_schedule', 'label': 'График платежей', 'type': 'textarea', 'required': False, 'placeholder': '50% - аванс, 50% - после приемки работ'}
-                ]
-            },
-            
-            # 6. Исковое заявление о взыскании алиментов
-            {
-                'name': 'Образец искового заявления о взыскании алиментов на ребенка',
-                'category': 'Исковые заявления',
-                'type': 'Исковое заявление',
-                'word_count': 52892,
-                'description': 'Исковое заявление о взыскании алиментов на несовершеннолетнего ребенка',
-                'fields': [
-                    {'key': 'court_name', 'label': 'Наименование суда', 'type': 'text', 'required': True, 'placeholder': 'Мировой суд судебного участка №1'},
-                    {'key': 'plaintiff_name', 'label': 'ФИО Истца (получателя алиментов)', 'type': 'text', 'required': True},
-                    {'key': 'plaintiff_address', 'label': 'Адрес Истца', 'type': 'text', 'required': True},
-                    {'key': 'plaintiff_phone', 'label': 'Телефон Истца', 'type': 'phone', 'required': True},
-                    {'key': 'defendant_name', 'label': 'ФИО Ответчика (плательщика алиментов)', 'type': 'text', 'required': True},
-                    {'key': 'defendant_address', 'label': 'Адрес Ответчика', 'type': 'text', 'required': True},
-                    {'key': 'child_name', 'label': 'ФИО ребенка', 'type': 'text', 'required': True},
-                    {'key': 'child_birthdate', 'label': 'Дата рождения ребенка', 'type': 'date', 'required': True},
-                    {'key': 'child_birth_certificate', 'label': 'Свидетельство о рождении', 'type': 'text', 'required': True, 'placeholder': 'серия II-АБ №123456'},
-                    {'key': 'marriage_status', 'label': 'Брак зарегистрирован', 'type': 'boolean', 'required': True},
-                    {'key': 'alimony_amount', 'label': 'Размер алиментов', 'type': 'select', 'required': True,
-                     'options': ['1/4 заработка', '1/3 заработка', '1/2 заработка', 'Твердая денежная сумма']},
-                    {'key': 'request', 'label': 'Прошу взыскать', 'type': 'textarea', 'required': True, 
-                     'placeholder': 'Взыскать с Ответчика алименты на содержание ребенка...'}
-                ]
-            },
-            
-            # 7. Доверенность в налоговую
-            {
-                'name': 'Образец доверенности в налоговую от юридического лица',
-                'category': 'Доверенности',
-                'type': 'Доверенность',
-                'word_count': 7894,
-                'description': 'Доверенность на представление интересов компании в налоговой инспекции',
-                'fields': [
-                    {'key': 'company_name', 'label': 'Наименование организации', 'type': 'text', 'required': True, 'placeholder': 'ООО "Вектор"'},
-                    {'key': 'company_details', 'label': 'Реквизиты организации', 'type': 'textarea', 'required': True, 'placeholder': 'ИНН 1234567890, ОГРН 1234567890123, адрес: г. Москва...'},
-                    {'key': 'director_name', 'label': 'ФИО руководителя', 'type': 'text', 'required': True, 'placeholder': 'Генеральный директор Иванов И.И.'},
-                    {'key': 'trustee_name', 'label': 'ФИО доверенного лица', 'type': 'text', 'required': True},
-                    {'key': 'trustee_passport', 'label': 'Паспортные данные доверенного лица', 'type': 'text', 'required': True},
-                    {'key': 'tax_office', 'label': 'Наименование налоговой инспекции', 'type': 'text', 'required': True, 'placeholder': 'ИФНС России №1 по г. Москве'},
-                    {'key': 'purpose', 'label': 'Цель доверенности', 'type': 'textarea', 'required': True, 
-                     'placeholder': 'Представлять интересы организации, подавать документы, получать документы...'},
-                    {'key': 'validity_period', 'label': 'Срок действия (месяцев)', 'type': 'number', 'required': True, 'min': 1, 'max': 36},
-                    {'key': 'issue_date', 'label': 'Дата выдачи доверенности', 'type': 'date', 'required': True},
-                    {'key': 'with_right_of_substitution', 'label': 'С правом передоверия', 'type': 'boolean', 'required': False}
-                ]
-            },
-            
-            # 8. Расторжение договора по соглашению сторон
-            {
-                'name': 'Образец расторжения договора по соглашению сторон',
-                'category': 'Соглашения и расторжения',
-                'type': 'Расторжение',
-                'word_count': 35118,
-                'description': 'Соглашение о расторжении договора по взаимному согласию сторон',
-                'fields': [
-                    {'key': 'original_contract_number', 'label': 'Номер расторгаемого договора', 'type': 'text', 'required': True, 'placeholder': '№123 от 01.01.2023'},
-                    {'key': 'original_contract_date', 'label': 'Дата расторгаемого договора', 'type': 'date', 'required': True},
-                    {'key': 'party1_name', 'label': 'Наименование Стороны 1', 'type': 'text', 'required': True},
-                    {'key': 'party1_details', 'label': 'Реквизиты Стороны 1', 'type': 'textarea', 'required': True},
-                    {'key': 'party2_name', 'label': 'Наименование Стороны 2', 'type': 'text', 'required': True},
-                    {'key': 'party2_details', 'label': 'Реквизиты Стороны 2', 'type': 'textarea', 'required': True},
-                    {'key': 'termination_date', 'label': 'Дата расторжения договора', 'type': 'date', 'required': True},
-                    {'key': 'termination_reason', 'label': 'Причина расторжения', 'type': 'textarea', 'required': True, 
-                     'placeholder': 'По взаимному согласию сторон в связи с...'},
-                    {'key': 'mutual_settlements', 'label': 'Взаиморасчеты произведены', 'type': 'boolean', 'required': True},
-                    {'key': 'no_claims', 'label': 'Стороны претензий друг к другу не имеют', 'type': 'boolean', 'required': True},
-                    {'key': 'signature_date', 'label': 'Дата подписания соглашения', 'type': 'date', 'required': True}
-                ]
-            },
-            
-            # 9. Акт приема-передачи автомобиля
-            {
-                'name': 'Образец акта приема-передачи автомобиля (простой)',
-                'category': 'Акты',
-                'type': 'Акт',
-                'word_count': 22754,
-                'description': 'Акт приема-передачи транспортного средства',
-                'fields': [
-                    {'key': 'act_number', 'label': 'Номер акта', 'type': 'text', 'required': True, 'placeholder': 'АКТ-1'},
-                    {'key': 'act_date', 'label': 'Дата составления акта', 'type': 'date', 'required': True},
-                    {'key': 'transferor_name', 'label': 'ФИО передающего', 'type': 'text', 'required': True},
-                    {'key': 'transferee_name', 'label': 'ФИО принимающего', 'type': 'text', 'required': True},
-                    {'key': 'car_brand', 'label': 'Марка автомобиля', 'type': 'text', 'required': True},
-                    {'key': 'car_model', 'label': 'Модель автомобиля', 'type': 'text', 'required': True},
-                    {'key': 'car_year', 'label': 'Год выпуска', 'type': 'number', 'required': True},
-                    {'key': 'vin', 'label': 'VIN номер', 'type': 'text', 'required': True},
-                    {'key': 'state_number', 'label': 'Государственный номер', 'type': 'text', 'required': True},
-                    {'key': 'mileage', 'label': 'Пробег (км)', 'type': 'number', 'required': True, 'min': 0},
-                    {'key': 'condition_description', 'label': 'Описание состояния', 'type': 'textarea', 'required': True, 
-                     'placeholder': 'Автомобиль передан в исправном техническом состоянии...'},
-                    {'key': 'documents_list', 'label': 'Передаваемые документы', 'type': 'textarea', 'required': True,
-                     'placeholder': 'ПТС, СТС, ключи (2 шт.), сервисная книжка...'},
-                    {'key': 'transfer_purpose', 'label': 'Цель передачи', 'type': 'select', 'required': True,
-                     'options': ['Продажа', 'Аренда', 'Хранение', 'Ремонт', 'Другое']}
-                ]
-            },
-            
-            # 10. Завещание (прочее)
-            {
-                'name': 'Образец завещания имущества (с подназначением наследника)',
-                'category': 'Прочее',
-                'type': 'Прочее',
-                'word_count': 3734,
-                'description': 'Завещание с указанием основного и подназначенного наследника',
-                'fields': [
-                    {'key': 'testator_name', 'label': 'ФИО Завещателя', 'type': 'text', 'required': True},
-                    {'key': 'testator_passport', 'label': 'Паспортные данные Завещателя', 'type': 'text', 'required': True},
-                    {'key': 'testator_address', 'label': 'Адрес Завещателя', 'type': 'text', 'required': True},
-                    {'key': 'testator_birthdate', 'label': 'Дата рождения Завещателя', 'type': 'date', 'required': True},
-                    {'key': 'notary_name', 'label': 'ФИО нотариуса', 'type': 'text', 'required': True},
-                    {'key': 'notary_office', 'label': 'Нотариальная контора', 'type': 'text', 'required': True},
-                    {'key': 'main_heir_name', 'label': 'ФИО основного наследника', 'type': 'text', 'required': True},
-                    {'key': 'main_heir_relation', 'label': 'Отношение к Завещателю', 'type': 'text', 'required': True, 'placeholder': 'сын, дочь, супруг(а)'},
-                    {'key': 'substitute_heir_name', 'label': 'ФИО подназначенного наследника', 'type': 'text', 'required': False},
-                    {'key': 'property_description', 'label': 'Описание завещаемого имущества', 'type': 'textarea', 'required': True,
-                     'placeholder': 'Квартира, расположенная по адресу... Автомобиль марки... Денежные средства...'},
-                    {'key': 'special_conditions', 'label': 'Особые условия', 'type': 'textarea', 'required': False,
-                     'placeholder': 'Имущество не подлежит разделу... Наследник обязуется...'},
-                    {'key': 'execution_date', 'label': 'Дата составления завещания', 'type': 'date', 'required': True}
-                ]
-            }
-        ]
-        
-        added_count = 0
-        for template in templates_data:
-            try:
-                cursor = conn.execute('''
-                    INSERT INTO templates (category_id, name, description, doc_type, word_count)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (category_ids[template['category']], template['name'], 
-                      template.get('description', ''), template['type'], template['word_count']))
+    # Накопленные просмотры относятся к удаляемым шаблонам
+    with _popularity_lock:
+        _popularity_counter.clear()
+    
+    # Сообщения выводятся после записи, чтобы не удерживать блокировку базы
+    messages = []
+    with get_write_conn() as conn:
+        # ATTACH недоступен внутри транзакции, поэтому выполняется до нее
+        seed_attached = attach_seed_db(conn, messages)
+        try:
+            # Весь сид выполняется одной транзакцией
+            with bulk_load(conn):
+                # Индексы строятся заново один раз после вставки, а не обновляются
+                # на каждой строке; в той же транзакции читатели их не теряют
+                for index_name, _ in TEMPLATE_INDEXES:
+                    conn.execute(f'DROP INDEX IF EXISTS {index_name}')
                 
-                template_id = cursor.lastrowid
-                added_count += 1
+                # Очищаем таблицы
+                conn.execute('DELETE FROM templates')
+                conn.execute('DELETE FROM categories')
                 
-                for i, field in enumerate(template['fields']):
-                    options_json = json.dumps(field.get('options', [])) if 'options' in field else None
-                    conn.execute('''
-                        INSERT INTO template_fields (template_id, field_key, field_label, field_type, 
-                                                     is_required, options, placeholder, min_value, max_value, order_index)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (template_id, field['key'], field['label'], field['type'], 
-                          field.get('required', False), options_json, field.get('placeholder'),
-                          field.get('min'), field.get('max'), i))
+                # Готовая база копируется одним INSERT ... SELECT на таблицу
+                if seed_attached:
+                    copy_seed_db(conn)
+                else:
+                    insert_seed_data(conn)
                 
-            except Exception as e:
-                print(f"Ошибка при добавлении шаблона '{template['name']}': {str(e)}")
-                continue
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': f'База данных успешно заполнена! Добавлено {added_count} шаблонов.',
-            'templates_added': added_count,
-            'templates_list': [t['name'] for t in templates_data[:added_count]]
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Ошибка при заполнении базы данных: {str(e)}'}), 500
+                for _, create_sql in TEMPLATE_INDEXES:
+                    conn.execute(create_sql)
+                
+                # Обновляем статистику для планировщика запросов
+                conn.execute('ANALYZE')
+        finally:
+            if seed_attached:
+                conn.execute('DETACH DATABASE seed')
+    
+    for message in messages:
+        app.logger.warning(message)
+    _response_cache.clear()
+    
+    return Response(_SEED_OK_BODY, mimetype='application/json')
     
 
 if __name__ == '__main__':
-    init_database()
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Промышленный WSGI-сервер вместо отладочного сервера Werkzeug;
+    # для gunicorn: gunicorn -k gthread --threads 8 app:app
+    from waitress import serve
+    ensure_database()
+    serve(app, host='0.0.0.0', port=5000, threads=SERVER_THREADS)
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Сборка data/seed.db для /api/admin/seed: перезапускать после изменения начальных данных"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+def build_seed_db():
+    """Собрать базу с начальными данными в data/seed.db"""
+    if os.path.exists(app.SEED_DB_PATH):
+        os.remove(app.SEED_DB_PATH)
+    
+    # Схема создается тем же кодом, что и основная база
+    app.DB_PATH = app.SEED_DB_PATH
+    app.init_database()
+    
+    conn = app.get_db_connection()
+    with app.bulk_load(conn):
+        app.insert_seed_data(conn)
+        conn.execute(f'PRAGMA user_version = {app.SEED_VERSION}')
+    
+    # Файл поставляется целиком, без журнала WAL рядом с ним
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.execute('VACUUM')
+    conn.close()
+    print(f'{app.SEED_DB_PATH}: {len(app.SEED_TEMPLATE_ROWS)} шаблонов')
+
+
+if __name__ == '__main__':
+    build_seed_db()